@@ -13,6 +13,9 @@ import sqlite3
 import datetime
 import json
 import os
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
@@ -21,11 +24,57 @@ DB_PATH = "clinic.db"
 # -------------------------
 # Database helpers
 # -------------------------
+_local = threading.local()  # one connection per thread (GUI + scheduler worker)
+_DB_LOCK = threading.Lock()  # serialises writes across threads
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+)
+
+# SQL used by the helpers below; passing the same string objects each call
+# lets sqlite3's statement cache hand back the already-compiled statement.
+_INSERT_DOCTOR = "INSERT INTO doctors (name, specialty, capacity_per_slot) VALUES (?, ?, ?)"
+_INSERT_PATIENT = "INSERT INTO patients (name, needs_specialist, specialty_required, emergency, preferred_slots) VALUES (?, ?, ?, ?, ?)"
+_INSERT_APPOINTMENT = "INSERT INTO appointments (patient_id, doctor_id, slot, date) VALUES (?, ?, ?, ?)"
+_SELECT_DOCTORS = "SELECT * FROM doctors ORDER BY id"
+_SELECT_PATIENTS = "SELECT * FROM patients ORDER BY id"
+_SELECT_APPOINTMENTS_FOR_DATE = """SELECT a.id, a.patient_id, p.name as patient_name, a.doctor_id, d.name as doctor_name, a.slot, a.date
+    FROM appointments a
+    LEFT JOIN patients p ON p.id = a.patient_id
+    LEFT JOIN doctors d ON d.id = a.doctor_id
+    WHERE a.date = ?
+    ORDER BY a.slot"""
+_SELECT_APPOINTMENTS = """SELECT a.id, a.patient_id, p.name as patient_name, a.doctor_id, d.name as doctor_name, a.slot, a.date
+    FROM appointments a
+    LEFT JOIN patients p ON p.id = a.patient_id
+    LEFT JOIN doctors d ON d.id = a.doctor_id
+    ORDER BY a.date, a.slot"""
+_DELETE_APPOINTMENTS_FOR_DATE = "DELETE FROM appointments WHERE date = ?"
+
+# Doctor/patient rosters only change through add_doctor/add_patient, which
+# bump these counters; list_* re-query only when the version has moved.
+_roster_version = {'doctors': 0, 'patients': 0}
+_roster_cache = {}  # table -> (version, list of sqlite3.Row)
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Return this thread's connection, opening and tuning it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("PRAGMA optimize")
+        _local.conn = conn
     return conn
 
+# STRICT tables (SQLite 3.37+) enforce column types instead of coercing
+_STRICT = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+
 def init_db():
     conn = get_conn()
     cur = conn.cursor()
@@ -36,8 +85,7 @@ def init_db():
         name TEXT NOT NULL,
         specialty TEXT,
         capacity_per_slot INTEGER DEFAULT 1
-    )
-    """)
+    )""" + _STRICT)
     # patients
     cur.execute("""
     CREATE TABLE IF NOT EXISTS patients (
@@ -47,8 +95,7 @@ def init_db():
         specialty_required TEXT,
         emergency INTEGER DEFAULT 0,
         preferred_slots TEXT
-    )
-    """)
+    )""" + _STRICT)
     # appointments
     cur.execute("""
     CREATE TABLE IF NOT EXISTS appointments (
@@ -62,224 +109,398 @@ def init_db():
         FOREIGN KEY(doctor_id) REFERENCES doctors(id)
     )
     """)
-    conn.commit()
-    conn.close()
+    # covers list_appointments(date): filter, ORDER BY slot and both join keys
+    # come from the index; it also replaces the older date-only index
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_app_cover ON appointments(date, slot, patient_id, doctor_id)")
+    cur.execute("DROP INDEX IF EXISTS idx_app_date")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_app_patient ON appointments(patient_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_app_doctor ON appointments(doctor_id)")
 
 def add_doctor(name, specialty="", capacity=1):
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO doctors (name, specialty, capacity_per_slot) VALUES (?, ?, ?)",
-                (name, specialty, capacity))
-    conn.commit()
-    conn.close()
+    with _DB_LOCK:
+        conn.execute(_INSERT_DOCTOR, (name, specialty, capacity))
+        _roster_version['doctors'] += 1
 
 def add_patient(name, needs_specialist=0, specialty_required=None, emergency=0, preferred_slots=None):
     conn = get_conn()
-    cur = conn.cursor()
     pref = ",".join(preferred_slots) if preferred_slots else None
-    cur.execute("INSERT INTO patients (name, needs_specialist, specialty_required, emergency, preferred_slots) VALUES (?, ?, ?, ?, ?)",
-                (name, needs_specialist, specialty_required, emergency, pref))
-    conn.commit()
-    conn.close()
+    with _DB_LOCK:
+        conn.execute(_INSERT_PATIENT, (name, needs_specialist, specialty_required, emergency, pref))
+        _roster_version['patients'] += 1
+
+def _cached_roster(table, sql):
+    version = _roster_version[table]
+    cached = _roster_cache.get(table)
+    if cached is None or cached[0] != version:
+        cur = get_conn().cursor()
+        cur.execute(sql)
+        cached = (version, cur.fetchall())
+        _roster_cache[table] = cached
+    return list(cached[1])
 
 def list_doctors():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM doctors ORDER BY id")
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    return _cached_roster('doctors', _SELECT_DOCTORS)
 
 def list_patients():
-    conn = get_conn()
-    cur = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patients ORDER BY id")
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    return _cached_roster('patients', _SELECT_PATIENTS)
 
 def save_appointment(patient_id, doctor_id, slot, date):
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO appointments (patient_id, doctor_id, slot, date) VALUES (?, ?, ?, ?)",
-                (patient_id, doctor_id, slot, date))
-    conn.commit()
-    conn.close()
+    with _DB_LOCK:
+        conn.execute(_INSERT_APPOINTMENT, (patient_id, doctor_id, slot, date))
+
+def save_appointments(rows):
+    """Insert many (patient_id, doctor_id, slot, date) rows in one transaction."""
+    conn = get_conn()
+    with _DB_LOCK, conn:
+        conn.execute("BEGIN")
+        conn.executemany(_INSERT_APPOINTMENT, rows)
 
 def list_appointments(date=None):
     conn = get_conn()
     cur = conn.cursor()
     if date:
-        cur.execute("""SELECT a.id, a.patient_id, p.name as patient_name, a.doctor_id, d.name as doctor_name, a.slot, a.date
-                       FROM appointments a
-                       LEFT JOIN patients p ON p.id = a.patient_id
-                       LEFT JOIN doctors d ON d.id = a.doctor_id
-                       WHERE a.date = ?
-                       ORDER BY a.slot""", (date,))
+        cur.execute(_SELECT_APPOINTMENTS_FOR_DATE, (date,))
     else:
-        cur.execute("""SELECT a.id, a.patient_id, p.name as patient_name, a.doctor_id, d.name as doctor_name, a.slot, a.date
-                       FROM appointments a
-                       LEFT JOIN patients p ON p.id = a.patient_id
-                       LEFT JOIN doctors d ON d.id = a.doctor_id
-                       ORDER BY a.date, a.slot""")
-    rows = cur.fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+        cur.execute(_SELECT_APPOINTMENTS)
+    return cur.fetchall()
 
 def clear_appointments_for_date(date):
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM appointments WHERE date = ?", (date,))
-    conn.commit()
-    conn.close()
+    with _DB_LOCK:
+        conn.execute(_DELETE_APPOINTMENTS_FOR_DATE, (date,))
 
 # -------------------------
 # Time slot generation
 # -------------------------
+# The scheduler works on slots as int minutes after midnight; "HH:MM"
+# strings only appear at the DB / GUI boundary.
+def slot_to_minutes(slot):
+    """'HH:MM' -> minutes after midnight."""
+    h, m = slot.split(":")
+    return int(h) * 60 + int(m)
+
+def minutes_to_slot(minutes):
+    """Minutes after midnight -> 'HH:MM'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def generate_slot_minutes(start="09:00", end="17:00", slot_minutes=30):
+    """Return list of slot start times as minutes after midnight."""
+    return list(range(slot_to_minutes(start), slot_to_minutes(end), slot_minutes))
+
 def generate_slots(start="09:00", end="17:00", slot_minutes=30):
     """Return list of slot strings 'HH:MM'."""
-    fmt = "%H:%M"
-    s = datetime.datetime.strptime(start, fmt)
-    e = datetime.datetime.strptime(end, fmt)
-    slots = []
-    cur = s
-    while cur < e:
-        slots.append(cur.strftime(fmt))
-        cur += datetime.timedelta(minutes=slot_minutes)
-    return slots
+    return [minutes_to_slot(m) for m in generate_slot_minutes(start, end, slot_minutes)]
 
 # -------------------------
 # CSP scheduler
 # -------------------------
+@functools.lru_cache(maxsize=256)
+def parse_preferred_slots(raw):
+    """Decode a stored comma-separated preference string into a frozenset of
+    slot minutes, or None when the patient has no preference. Entries that
+    aren't valid times can never match a slot and are dropped."""
+    entries = [s.strip() for s in (raw or "").split(",") if s.strip()]
+    if not entries:
+        return None
+    pref = set()
+    for entry in entries:
+        try:
+            pref.add(slot_to_minutes(entry))
+        except ValueError:
+            continue
+    return frozenset(pref)
+
 def build_domains(patients, doctors, slots):
     """
     Build initial domains:
+      - slots are minutes after midnight (see slot_to_minutes).
       - For each patient, a list of (doctor_id, slot) pairs allowed.
       - Respect specialist requirement & preferred slots if present.
+      - Pairs are ordered by slot, then doctor, which is the order the
+        search tries them in.
     """
-    doctor_by_id = {d['id']: d for d in doctors}
+    # (doctor_id, slot) pairs are the same for every patient asking for a
+    # given specialty, so build each list once up front.
+    all_docs = [d['id'] for d in doctors]
+    spec_to_docs = {}
+    for d in doctors:
+        if d['specialty']:
+            spec_to_docs.setdefault(d['specialty'].lower(), []).append(d['id'])
+    all_pairs = tuple((d_id, slot) for slot in slots for d_id in all_docs)
+    spec_to_pairs = {spec: tuple((d_id, slot) for slot in slots for d_id in ids)
+                     for spec, ids in spec_to_docs.items()}
+
     domains = {}
     for p in patients:
-        allowed = []
-        pref_list = []
-        if p.get('preferred_slots'):
-            # stored as comma separated string in DB
-            pref_list = [s.strip() for s in (p['preferred_slots'] or "").split(",") if s.strip()]
-        for d in doctors:
-            # if patient needs specialist and doctor doesn't match, skip
-            if p['needs_specialist'] and p['specialty_required']:
-                if not d['specialty'] or d['specialty'].lower() != p['specialty_required'].lower():
-                    continue
-            # for each slot
-            for slot in slots:
-                if pref_list and slot not in pref_list:
-                    continue
-                allowed.append((d['id'], slot))
-        domains[p['id']] = allowed
+        # if patient needs specialist, only matching doctors qualify
+        if p['needs_specialist'] and p['specialty_required']:
+            spec = p['specialty_required'].lower()
+            docs, base = spec_to_docs.get(spec, ()), spec_to_pairs.get(spec, ())
+        else:
+            docs, base = all_docs, all_pairs
+        pref_set = parse_preferred_slots(p['preferred_slots'])
+        if pref_set is None:
+            domains[p['id']] = list(base)
+        else:
+            allowed_slots = [slot for slot in slots if slot in pref_set]
+            domains[p['id']] = [(d_id, slot) for slot in allowed_slots for d_id in docs]
     return domains
 
-def select_unassigned_var(domains, assigned, patient_meta):
+def select_unassigned_var(alive, assigned, priority_groups):
     """
     MRV heuristic, with emergency priority:
         - Prefer emergency patients first (among unassigned)
         - Then pick variable with minimum remaining values.
-    patient_meta: dict patient_id -> {'emergency': 0/1}
+    alive/assigned are lists indexed by variable number; alive[v] is a
+    bitmask of v's still-legal values and assigned[v] is -1 while v is
+    unassigned. priority_groups is (emergency_vars, other_vars).
+    """
+    for group in priority_groups:
+        best = -1
+        best_len = None
+        for v in group:
+            if assigned[v] != -1:
+                continue
+            l = bin(alive[v]).count("1")
+            if best_len is None or l < best_len:
+                best = v
+                best_len = l
+        if best != -1:
+            return best
+    return -1
+
+@functools.lru_cache(maxsize=16)
+def clinic_layout(capacities, slots):
     """
-    unassigned = [vid for vid in domains.keys() if vid not in assigned]
-    # emergency first
-    emergencies = [v for v in unassigned if patient_meta.get(v, {}).get('emergency',0)]
-    pool = emergencies if emergencies else unassigned
-    # MRV
-    best = None
-    best_len = None
-    for v in pool:
-        l = len(domains[v])
-        if best is None or l < best_len:
-            best = v
-            best_len = l
-    return best
-
-def backtracking_search(domains, doctor_capacity, patient_meta):
+    Interned cell layout for one clinic configuration.
+    capacities: tuple of (doctor_id, capacity_per_slot); slots: tuple of slots.
+    Returns (cell_of, cell_pairs, cap_limit): cell_of maps (doctor_id, slot)
+    to its cell number slot_index * num_doctors + doctor_index, cell_pairs is
+    the inverse, and cap_limit[cell] is that doctor's capacity.
+    Doctors and slots rarely change between runs, so this is cached.
     """
-    domains: dict var -> list of (doctor_id, slot)
+    doc_ids = [d for d, _ in capacities]
+    cell_pairs = tuple((d, slot) for slot in slots for d in doc_ids)
+    cell_of = {pair: c for c, pair in enumerate(cell_pairs)}
+    # the per-doctor limits are simply repeated once per slot
+    cap_limit = tuple(cap for _, cap in capacities) * len(slots)
+    return cell_of, cell_pairs, cap_limit
+
+def backtracking_search(domains, doctor_capacity, patient_meta, layout=None):
+    """
+    domains: dict var -> list of (doctor_id, slot), in the order to try them
     doctor_capacity: dict doctor_id -> capacity_per_slot (int)
     patient_meta: dict patient_id -> meta (emergency etc)
+    layout: clinic_layout() covering every value in domains; derived from
+        the domains when omitted
+
+    Internally every (doctor, slot) pair is interned as an integer cell, so
+    the search only touches flat lists indexed by ints instead of hashing
+    tuples.
+
+    Each variable keeps a fixed tuple of cells plus an "alive" bitmask over
+    it. Forward checking clears bits and records them on a trail; undoing
+    a decision pops the trail back to its checkpoint and sets them again.
+    Failures report which earlier decisions caused them, and the search
+    backjumps to the latest of those instead of the previous level.
     """
-
-    assigned = {}
-    capacity_map = {}  # (doctor_id, slot) -> count
-
-    # recursive function
-    def backtrack():
-        if len(assigned) == len(domains):
-            return dict(assigned)  # found complete
-
-        var = select_unassigned_var(domains, assigned, patient_meta)
-        if var is None:
-            return None
-
-        domain_vals = list(domains[var])  # value ordering: try earlier slots first (stable)
-        # sort by slot time ascending to give earlier slots priority
-        domain_vals.sort(key=lambda x: x[1])
-
-        for val in domain_vals:
-            doc_id, slot = val
-            cap_key = (doc_id, slot)
-            used = capacity_map.get(cap_key, 0)
-            cap_limit = doctor_capacity.get(doc_id, 1)
-            if used >= cap_limit:
-                continue  # can't place here
-
-            # Tentatively assign
-            assigned[var] = val
-            capacity_map[cap_key] = used + 1
-
-            # Forward checking: reduce domains of other unassigned variables
-            removed_snapshot = {}
-            failure = False
-            for other in domains:
-                if other in assigned:
+    if layout is None:
+        doc_ids = sorted({d for vals in domains.values() for d, _ in vals})
+        slot_ids = sorted({s for vals in domains.values() for _, s in vals})
+        layout = clinic_layout(tuple((d, doctor_capacity.get(d, 1)) for d in doc_ids), tuple(slot_ids))
+    cell_of, cell_pairs, cap_limit = layout
+    ncells = len(cell_pairs)
+
+    var_ids = list(domains)
+    occupants = [[] for _ in range(ncells)]  # depths assigned to each cell
+    vals = [tuple(cell_of[pair] for pair in domains[v]) for v in var_ids]
+    nvars = len(var_ids)
+    emergency = [bool(patient_meta.get(v, {}).get('emergency', 0)) for v in var_ids]
+    priority_groups = ([v for v in range(nvars) if emergency[v]],
+                       [v for v in range(nvars) if not emergency[v]])
+    assigned = [-1] * nvars
+
+    # watchers[cell] lists every (var, bit) whose domain contains cell
+    watchers = [[] for _ in range(ncells)]
+    alive = [0] * nvars
+    for v, cells in enumerate(vals):
+        for i, c in enumerate(cells):
+            if cap_limit[c] > 0:
+                watchers[c].append((v, 1 << i))
+                alive[v] |= 1 << i
+    trail = []
+    full_mask = list(alive)
+
+    def explain(v):
+        """Depths whose assignments filled the cells pruned from v's domain."""
+        conflict = set()
+        cells = vals[v]
+        dead = full_mask[v] & ~alive[v]
+        while dead:
+            low = dead & -dead
+            dead ^= low
+            conflict.update(occupants[cells[low.bit_length() - 1]])
+        return conflict
+
+    # Iterative search: stack[depth] is [var, untried_mask, cell, trail_mark,
+    # conflict]. cell is -1 until the frame has a value assigned. When a
+    # frame fails, `failed` carries its conflict set (the earlier depths
+    # responsible) down to the frames below; a frame whose depth is not in
+    # it is popped straight away (conflict-directed backjumping).
+    if nvars == 0:
+        return {}
+    var = select_unassigned_var(alive, assigned, priority_groups)
+    stack = [[var, alive[var], -1, 0, set()]]
+    failed = None
+    while stack:
+        depth = len(stack) - 1
+        frame = stack[-1]
+        var, remaining, cell, mark, conflict = frame
+
+        if cell != -1:
+            # value at this depth failed: undo assignment & restore domains
+            assigned[var] = -1
+            occupants[cell].pop()
+            while len(trail) > mark:
+                other, bit = trail.pop()
+                alive[other] |= bit
+            frame[2] = -1
+            if depth not in failed:
+                stack.pop()  # this choice wasn't to blame; jump back
+                continue
+            failed.discard(depth)
+            conflict |= failed
+
+        if not remaining:
+            failed = conflict | explain(var)
+            stack.pop()
+            continue
+
+        # take the next live value; var's own mask is fixed while it is on
+        # the stack, since deeper levels only prune unassigned variables
+        low = remaining & -remaining
+        frame[1] = remaining ^ low
+        cell = vals[var][low.bit_length() - 1]
+
+        # Tentatively assign
+        assigned[var] = cell
+        occ = occupants[cell]
+        occ.append(depth)
+        frame[2] = cell
+        frame[3] = len(trail)
+
+        # Forward checking: only the cell just used can have filled up
+        failed = None
+        if len(occ) >= cap_limit[cell]:
+            for other, bit in watchers[cell]:
+                if assigned[other] != -1 or not alive[other] & bit:
                     continue
-                new_domain = []
-                removed_snapshot[other] = []
-                for v in domains[other]:
-                    d_id, s = v
-                    key = (d_id, s)
-                    cur_used = capacity_map.get(key, 0)
-                    if cur_used >= doctor_capacity.get(d_id, 1):
-                        # this value violates capacity now; skip (remove)
-                        removed_snapshot[other].append(v)
-                        continue
-                    new_domain.append(v)
-                if not new_domain:
-                    failure = True
+                alive[other] ^= bit
+                trail.append((other, bit))
+                if not alive[other]:
+                    failed = explain(other)
                     break
-                # replace domain
-                domains[other] = new_domain
-
-            if not failure:
-                result = backtrack()
-                if result is not None:
-                    return result
-
-            # undo assignment & restore domains & capacity map
-            del assigned[var]
-            capacity_map[cap_key] = capacity_map.get(cap_key, 1) - 1
-            if capacity_map[cap_key] == 0:
-                del capacity_map[cap_key]
-            # restore domains from snapshot
-            for other, removed in removed_snapshot.items():
-                if removed:
-                    # put removed values back (append and sort to keep stable)
-                    domains[other].extend(removed)
-                    domains[other].sort(key=lambda x: x[1])
+        if failed is not None:
+            continue
 
-        return None
+        if depth + 1 == nvars:
+            return {var_ids[v]: cell_pairs[c] for v, c in enumerate(assigned)}
+        nxt = select_unassigned_var(alive, assigned, priority_groups)
+        stack.append([nxt, alive[nxt], -1, 0, set()])
+
+    return None
+
+def propagate_ac(domains, doctor_capacity):
+    """
+    Capacity-constraint propagation run before the search.
+      - Patients whose whole domain sits on one doctor (or one slot) must
+        fit in that doctor's (slot's) total capacity, else infeasible.
+      - A patient with a single value reserves it; once a (doctor, slot)
+        is fully reserved it is removed from every other patient's domain.
+        This repeats until nothing changes.
+    Returns pruned copies of the domains, or None if provably infeasible.
+    """
+    domains = {k: list(v) for k, v in domains.items()}
+
+    for axis in (0, 1):  # 0: by doctor, 1: by slot
+        groups = {}
+        for vals in domains.values():
+            keys = {val[axis] for val in vals}
+            if len(keys) == 1:
+                group = groups.setdefault(keys.pop(), [0, set()])
+                group[0] += 1
+                group[1].update(vals)
+        for demand, cells in groups.values():
+            if demand > sum(doctor_capacity.get(d, 1) for d, _ in cells):
+                return None
+
+    changed = True
+    while changed:
+        changed = False
+        reserved = {}
+        for vals in domains.values():
+            if not vals:
+                return None
+            if len(vals) == 1:
+                reserved[vals[0]] = reserved.get(vals[0], 0) + 1
+        full = set()
+        for val, count in reserved.items():
+            cap = doctor_capacity.get(val[0], 1)
+            if count > cap:
+                return None
+            if count == cap:
+                full.add(val)
+        if not full:
+            break
+        for var, vals in domains.items():
+            if len(vals) > 1:
+                kept = [val for val in vals if val not in full]
+                if len(kept) != len(vals):
+                    domains[var] = kept
+                    changed = True
+    return domains
 
-    # Make a deep copy of domains to allow safe modifications
-    domains = {k: list(v) for k,v in domains.items()}
-    return backtrack()
+def pool_doctors(doctors):
+    """
+    Group interchangeable doctors (same specialty, same capacity) so the
+    search doesn't explore symmetric branches such as P1->DocA vs P1->DocB.
+    Returns (representatives, pool_capacity, members): one doctor row per
+    pool whose id stands for the pool, the pool's summed capacity per
+    slot, and the member doctor ids of each pool.
+    """
+    pool_of = {}
+    representatives = []
+    pool_capacity = {}
+    members = {}
+    for d in doctors:
+        cap = int(d['capacity_per_slot'])
+        key = ((d['specialty'] or "").lower(), cap)
+        rep = pool_of.get(key)
+        if rep is None:
+            rep = pool_of[key] = d['id']
+            representatives.append(d)
+            pool_capacity[rep] = 0
+            members[rep] = []
+        pool_capacity[rep] += cap
+        members[rep].append(d['id'])
+    return representatives, pool_capacity, members
+
+def assign_pool_members(assignment, members):
+    """
+    Map a pooled assignment (patient -> (pool_id, slot)) onto concrete
+    doctors, handing out each pool's patients round-robin per slot. Members
+    share the same capacity, so no doctor exceeds it.
+    """
+    handed_out = {}
+    result = {}
+    for pid, (pool, slot) in assignment.items():
+        n = handed_out.get((pool, slot), 0)
+        handed_out[(pool, slot)] = n + 1
+        docs = members[pool]
+        result[pid] = (docs[n % len(docs)], slot)
+    return result
 
 def schedule_for_date(date_str, start="09:00", end="17:00", slot_minutes=30, clear_existing=True):
     """
@@ -293,39 +514,42 @@ def schedule_for_date(date_str, start="09:00", end="17:00", slot_minutes=30, cle
     if not patients:
         return False, None, "No patients registered."
 
-    slots = generate_slots(start, end, slot_minutes)
-    domains = build_domains(patients, doctors, slots)
+    slots = generate_slot_minutes(start, end, slot_minutes)
+    # search over pools of equivalent doctors; their capacities are summed
+    pool_reps, doctor_capacity, pool_members = pool_doctors(doctors)
+    domains = build_domains(patients, pool_reps, slots)
 
     # patient metadata
     patient_meta = {p['id']: {'emergency': p['emergency'], 'name': p['name']} for p in patients}
 
-    doctor_capacity = {d['id']: int(d.get('capacity_per_slot', 1)) for d in doctors}
-
     # Clear existing appointments for that date if desired
     if clear_existing:
         clear_appointments_for_date(date_str)
 
-    assignment = backtracking_search(domains, doctor_capacity, patient_meta)
+    layout = clinic_layout(tuple(doctor_capacity.items()), tuple(slots))
+    domains = propagate_ac(domains, doctor_capacity)
+    assignment = backtracking_search(domains, doctor_capacity, patient_meta, layout) if domains is not None else None
     if assignment is None:
         return False, None, "Could not find feasible schedule with current constraints."
+    assignment = assign_pool_members(assignment, pool_members)
 
     # Save assignments to DB
-    for patient_id, (doctor_id, slot) in assignment.items():
-        save_appointment(patient_id, doctor_id, slot, date_str)
+    # sort by slot, then format slots back to 'HH:MM' for the DB and display
+    ordered = sorted(assignment.items(), key=lambda item: item[1][1])
+    rows = [(pid, did, minutes_to_slot(slot), date_str) for pid, (did, slot) in ordered]
+    save_appointments(rows)
 
     # build readable list
     readable = []
     # convert IDs to names for display
     doc_names = {d['id']: d['name'] for d in doctors}
     pat_names = {p['id']: p['name'] for p in patients}
-    for pid, (did, slot) in assignment.items():
+    for pid, did, slot, _ in rows:
         readable.append({
             'patient_id': pid, 'patient_name': pat_names.get(pid, 'Unknown'),
             'doctor_id': did, 'doctor_name': doc_names.get(did, 'Unknown'),
             'slot': slot, 'date': date_str
         })
-    # sort by slot
-    readable.sort(key=lambda x: x['slot'])
     return True, readable, f"Scheduled {len(readable)} patients for {date_str}"
 
 # -------------------------
@@ -353,6 +577,8 @@ class SchedulerApp(tk.Tk):
         super().__init__()
         self.title("Clinic Appointment Scheduler (CSP)")
         self.geometry("1000x600")
+        self._shown_versions = {}  # roster versions currently displayed
+        self._pool = ThreadPoolExecutor(max_workers=1)  # runs the scheduler off the Tk thread
         self.create_widgets()
         self.refresh_lists()
 
@@ -367,7 +593,8 @@ class SchedulerApp(tk.Tk):
         ttk.Entry(top, textvariable=self.date_var, width=12).pack(side=tk.LEFT, padx=6)
 
         ttk.Button(top, text="Populate sample data", command=self.on_populate).pack(side=tk.LEFT, padx=6)
-        ttk.Button(top, text="Run Scheduler", command=self.on_run_scheduler).pack(side=tk.LEFT, padx=6)
+        self.run_button = ttk.Button(top, text="Run Scheduler", command=self.on_run_scheduler)
+        self.run_button.pack(side=tk.LEFT, padx=6)
         ttk.Button(top, text="View Appointments", command=self.on_view_appointments).pack(side=tk.LEFT, padx=6)
         ttk.Button(top, text="Clear Appointments (date)", command=self.on_clear_appointments).pack(side=tk.LEFT, padx=6)
 
@@ -410,16 +637,21 @@ class SchedulerApp(tk.Tk):
         self.schedule_tree.pack(fill=tk.BOTH, expand=True)
 
     def refresh_lists(self):
+        # only rebuild a tree when its roster changed since the last refresh
+        shown = self._shown_versions
         # doctors
-        for r in self.doctor_tree.get_children():
-            self.doctor_tree.delete(r)
-        for d in list_doctors():
-            self.doctor_tree.insert("", tk.END, values=(d['id'], d['name'], d['specialty'] or "", d['capacity_per_slot']))
+        if shown.get('doctors') != _roster_version['doctors']:
+            for r in self.doctor_tree.get_children():
+                self.doctor_tree.delete(r)
+            for d in list_doctors():
+                self.doctor_tree.insert("", tk.END, values=(d['id'], d['name'], d['specialty'] or "", d['capacity_per_slot']))
         # patients
-        for r in self.patient_tree.get_children():
-            self.patient_tree.delete(r)
-        for p in list_patients():
-            self.patient_tree.insert("", tk.END, values=(p['id'], p['name'], "Yes" if p['needs_specialist'] else "No", p.get('specialty_required') or "", "Yes" if p['emergency'] else "No"))
+        if shown.get('patients') != _roster_version['patients']:
+            for r in self.patient_tree.get_children():
+                self.patient_tree.delete(r)
+            for p in list_patients():
+                self.patient_tree.insert("", tk.END, values=(p['id'], p['name'], "Yes" if p['needs_specialist'] else "No", p['specialty_required'] or "", "Yes" if p['emergency'] else "No"))
+        self._shown_versions = dict(_roster_version)
 
     def on_populate(self):
         populate_sample_data()
@@ -457,7 +689,18 @@ class SchedulerApp(tk.Tk):
         except ValueError:
             messagebox.showerror("Date error", "Date must be YYYY-MM-DD")
             return
-        ok, readable, msg = schedule_for_date(date)
+        # search can take a while; keep the GUI responsive meanwhile
+        self.run_button.state(["disabled"])
+        fut = self._pool.submit(schedule_for_date, date)
+        fut.add_done_callback(lambda f: self.after(0, self._on_schedule_done, f))
+
+    def _on_schedule_done(self, fut):
+        self.run_button.state(["!disabled"])
+        try:
+            ok, readable, msg = fut.result()
+        except Exception as e:
+            messagebox.showerror("Scheduling failed", str(e))
+            return
         if ok:
             # display
             for r in self.schedule_tree.get_children():